@@ -3,6 +3,7 @@ Chat-Product Service: Handles chat interactions with product recommendations usi
 """
 import os
 import logging
+from functools import lru_cache
 from typing import Optional
 import asyncio
 import json
@@ -34,21 +35,53 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Environment variables
-NLP_SERVICE_URL = os.getenv("NLP_SERVICE_URL", "http://nlp-service:8001")
-VISION_SERVICE_URL = os.getenv("VISION_SERVICE_URL", "http://vision-service:8002")
-REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379")
-N8N_WEBHOOK_URL = os.getenv("N8N_WEBHOOK_URL", "http://72.61.76.44:5678/webhook/37b254d7-d925-4e3a-a725-edbbe4f225b8")
+class Settings(BaseModel):
+    """Service configuration resolved from environment variables."""
+    nlp_service_url: str
+    vision_service_url: str
+    redis_url: str
+    n8n_webhook_url: str
+
+
+@lru_cache
+def get_settings() -> Settings:
+    """Resolve settings once per process.
+
+    Tests can call get_settings.cache_clear() after changing the environment
+    instead of reloading the whole module.
+    """
+    return Settings(
+        nlp_service_url=os.getenv("NLP_SERVICE_URL", "http://nlp-service:8001"),
+        vision_service_url=os.getenv("VISION_SERVICE_URL", "http://vision-service:8002"),
+        redis_url=os.getenv("REDIS_URL", "redis://redis:6379"),
+        n8n_webhook_url=os.getenv("N8N_WEBHOOK_URL", "http://72.61.76.44:5678/webhook/37b254d7-d925-4e3a-a725-edbbe4f225b8"),
+    )
+
+
+# Module-level aliases kept for existing call sites
+_settings = get_settings()
+NLP_SERVICE_URL = _settings.nlp_service_url
+VISION_SERVICE_URL = _settings.vision_service_url
+REDIS_URL = _settings.redis_url
+N8N_WEBHOOK_URL = _settings.n8n_webhook_url
 redis_client: aioredis.Redis | None = None
 
+# Shared outbound HTTP client; created on startup, closed on shutdown.
+# Reusing one keep-alive pool avoids a TCP handshake per webhook call.
+http_client: httpx.AsyncClient | None = None
+
 # Initialize Supabase on startup
 db_initialized = False
 
 
 @app.on_event("startup")
 async def startup_event():
-    global db_initialized, redis_client
+    global db_initialized, redis_client, http_client
     db_initialized = initialize_supabase()
+    http_client = httpx.AsyncClient(
+        timeout=10.0,
+        limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+    )
     # Redis init
     try:
         redis_client = aioredis.from_url(REDIS_URL, decode_responses=True)
@@ -63,6 +96,16 @@ async def startup_event():
         logger.info("Chat-Product service started (Supabase offline)")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    global http_client
+    if http_client is not None:
+        await http_client.aclose()
+        http_client = None
+    if redis_client is not None:
+        await redis_client.close()
+
+
 
 class ChatMessage(BaseModel):
     """Chat message payload from live stream comments.
@@ -308,33 +351,32 @@ async def process_chat(payload: ChatMessage):
         timestamp = datetime.utcnow().isoformat()
         
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                webhook_response = await client.post(
-                    N8N_WEBHOOK_URL,
-                    json={"message": user_message},
-                    headers={"Content-Type": "application/json"}
-                )
-                if webhook_response.status_code == 200:
-                    result = webhook_response.json()
-                    logger.info(f"Raw webhook response: {result}")
-                    
-                    # Parse webhook response: [{"intent": "yes"}] or [{"intent": "no"}]
-                    try:
-                        if isinstance(result, list) and len(result) > 0:
-                            first_item = result[0]
-                            intent = first_item.get("intent", "no").lower()
-                            cantidad = int(first_item.get("cantidad", 0))
-                        elif isinstance(result, dict):
-                            intent = result.get("intent", "no").lower()
-                            cantidad = int(result.get("cantidad", 0))
-                        
-                        logger.info(f"Intent classification from n8n: intent={intent}, cantidad={cantidad}")
-                    except (KeyError, TypeError, AttributeError) as parse_err:
-                        logger.warning(f"Failed to parse webhook response: {parse_err}")
-                        intent = "no"
-                        cantidad = 0
-                else:
-                    logger.warning(f"n8n webhook returned status {webhook_response.status_code}")
+            webhook_response = await http_client.post(
+                N8N_WEBHOOK_URL,
+                json={"message": user_message},
+                headers={"Content-Type": "application/json"}
+            )
+            if webhook_response.status_code == 200:
+                result = webhook_response.json()
+                logger.info(f"Raw webhook response: {result}")
+
+                # Parse webhook response: [{"intent": "yes"}] or [{"intent": "no"}]
+                try:
+                    if isinstance(result, list) and len(result) > 0:
+                        first_item = result[0]
+                        intent = first_item.get("intent", "no").lower()
+                        cantidad = int(first_item.get("cantidad", 0))
+                    elif isinstance(result, dict):
+                        intent = result.get("intent", "no").lower()
+                        cantidad = int(result.get("cantidad", 0))
+
+                    logger.info(f"Intent classification from n8n: intent={intent}, cantidad={cantidad}")
+                except (KeyError, TypeError, AttributeError) as parse_err:
+                    logger.warning(f"Failed to parse webhook response: {parse_err}")
+                    intent = "no"
+                    cantidad = 0
+            else:
+                logger.warning(f"n8n webhook returned status {webhook_response.status_code}")
         except Exception as e:
             logger.error(f"Failed to call n8n webhook for intent classification: {e}")
             intent = "no"
@@ -369,56 +411,56 @@ async def process_chat(payload: ChatMessage):
                 
                 # Step 2: Call vision-service to match product from frame (MinIO URL)
                 if frame_url:
-                    async with httpx.AsyncClient(timeout=15.0) as client:
-                        vision_response = await client.post(
-                            f"{VISION_SERVICE_URL}/match_product",
-                            json={
-                                "frame_urls": [frame_url],
-                                "streamer_id": payload.streamer_id
-                            },
-                            headers={"Content-Type": "application/json"}
-                        )
-                        if vision_response.status_code == 200:
-                            vision_result = vision_response.json()
-                            product_id = vision_result.get("productId")
-                            logger.info(f"Vision service matched product_id: {product_id}")
-                            
-                            # Step 3: Get product details from database
-                            if product_id and db_initialized:
-                                product_resp = supabase.table("products") \
-                                    .select("id,name,price,description,image_url,streamer_id") \
-                                    .eq("id", product_id) \
-                                    .limit(1) \
-                                    .execute()
-                                
-                                if product_resp.data and len(product_resp.data) > 0:
-                                    product = product_resp.data[0]
-                                    matched_product = {
-                                        "id": product.get("id"),
-                                        "name": product.get("name"),
-                                        "price": product.get("price"),
-                                        "description": product.get("description"),
-                                        "image_url": product.get("image_url"),
-                                        "cantidad": cantidad,
-                                        "total": float(product.get("price", 0)) * cantidad
-                                    }
-                                    payment_ready = True
-                                    response_text = f"¡Encontré el producto! {product.get('name')} - ${product.get('price')}. ¿Deseas proceder con la compra de {cantidad} unidad(es)?"
-                                    logger.info(f"Product matched and ready for payment: {matched_product}")
-                                    
-                                    # Track buyer intent in Supabase
-                                    await add_buyer_intent(
-                                        streamer=payload.streamer_id,
-                                        username=payload.user_id,
-                                        message=payload.message,
-                                        cantidad=cantidad,
-                                        timestamp=timestamp,
-                                        product_name=product.get("name"),
-                                        product_price=product.get("price"),
-                                        product_id=str(product.get("id"))
-                                    )
-                        else:
-                            logger.warning(f"Vision service returned status {vision_response.status_code}")
+                    vision_response = await http_client.post(
+                        f"{VISION_SERVICE_URL}/match_product",
+                        json={
+                            "frame_urls": [frame_url],
+                            "streamer_id": payload.streamer_id
+                        },
+                        headers={"Content-Type": "application/json"},
+                        timeout=15.0
+                    )
+                    if vision_response.status_code == 200:
+                        vision_result = vision_response.json()
+                        product_id = vision_result.get("productId")
+                        logger.info(f"Vision service matched product_id: {product_id}")
+
+                        # Step 3: Get product details from database
+                        if product_id and db_initialized:
+                            product_resp = supabase.table("products") \
+                                .select("id,name,price,description,image_url,streamer_id") \
+                                .eq("id", product_id) \
+                                .limit(1) \
+                                .execute()
+
+                            if product_resp.data and len(product_resp.data) > 0:
+                                product = product_resp.data[0]
+                                matched_product = {
+                                    "id": product.get("id"),
+                                    "name": product.get("name"),
+                                    "price": product.get("price"),
+                                    "description": product.get("description"),
+                                    "image_url": product.get("image_url"),
+                                    "cantidad": cantidad,
+                                    "total": float(product.get("price", 0)) * cantidad
+                                }
+                                payment_ready = True
+                                response_text = f"¡Encontré el producto! {product.get('name')} - ${product.get('price')}. ¿Deseas proceder con la compra de {cantidad} unidad(es)?"
+                                logger.info(f"Product matched and ready for payment: {matched_product}")
+
+                                # Track buyer intent in Supabase
+                                await add_buyer_intent(
+                                    streamer=payload.streamer_id,
+                                    username=payload.user_id,
+                                    message=payload.message,
+                                    cantidad=cantidad,
+                                    timestamp=timestamp,
+                                    product_name=product.get("name"),
+                                    product_price=product.get("price"),
+                                    product_id=str(product.get("id"))
+                                )
+                    else:
+                        logger.warning(f"Vision service returned status {vision_response.status_code}")
                 
                 # Fallback: recommend sample products if no match
                 if not matched_product:
@@ -518,21 +560,20 @@ async def _queue_comment_internal(payload: IncomingComment) -> dict:
     intent = "no"
     cantidad = 0
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            webhook_response = await client.post(
-                N8N_WEBHOOK_URL,
-                json={"message": payload.message},
-                headers={"Content-Type": "application/json"}
-            )
-            if webhook_response.status_code == 200:
-                result = webhook_response.json()
-                logger.info(f"NLP webhook response for '{payload.message}': {result}")
-                if isinstance(result, list) and len(result) > 0:
-                    intent = result[0].get("intent", "no").lower()
-                    cantidad = int(result[0].get("cantidad", 0))
-                elif isinstance(result, dict):
-                    intent = result.get("intent", "no").lower()
-                    cantidad = int(result.get("cantidad", 0))
+        webhook_response = await http_client.post(
+            N8N_WEBHOOK_URL,
+            json={"message": payload.message},
+            headers={"Content-Type": "application/json"}
+        )
+        if webhook_response.status_code == 200:
+            result = webhook_response.json()
+            logger.info(f"NLP webhook response for '{payload.message}': {result}")
+            if isinstance(result, list) and len(result) > 0:
+                intent = result[0].get("intent", "no").lower()
+                cantidad = int(result[0].get("cantidad", 0))
+            elif isinstance(result, dict):
+                intent = result.get("intent", "no").lower()
+                cantidad = int(result.get("cantidad", 0))
     except Exception as e:
         logger.warning("Failed to call NLP webhook: %s", e)
     
@@ -681,28 +722,28 @@ async def process_user_queue(payload: ProcessQueueRequest):
             # Combine all messages for context
             combined_messages = " | ".join(messages)
             
-            async with httpx.AsyncClient(timeout=15.0) as client:
-                webhook_response = await client.post(
-                    N8N_WEBHOOK_URL,
-                    json={"message": combined_messages},
-                    headers={"Content-Type": "application/json"}
-                )
-                if webhook_response.status_code == 200:
-                    result = webhook_response.json()
-                    logger.info(f"Webhook response: {result}")
-                    
-                    # Parse response: [{"intent": "yes/no", "cantidad": int}]
-                    if isinstance(result, list) and len(result) > 0:
-                        first_item = result[0]
-                        intent = first_item.get("intent", "no").lower()
-                        cantidad = int(first_item.get("cantidad", 0))
-                    elif isinstance(result, dict):
-                        intent = result.get("intent", "no").lower()
-                        cantidad = int(result.get("cantidad", 0))
-                    
-                    logger.info(f"Intent from NLP: {intent}, cantidad: {cantidad}")
-                else:
-                    logger.warning(f"Webhook returned status {webhook_response.status_code}")
+            webhook_response = await http_client.post(
+                N8N_WEBHOOK_URL,
+                json={"message": combined_messages},
+                headers={"Content-Type": "application/json"},
+                timeout=15.0
+            )
+            if webhook_response.status_code == 200:
+                result = webhook_response.json()
+                logger.info(f"Webhook response: {result}")
+
+                # Parse response: [{"intent": "yes/no", "cantidad": int}]
+                if isinstance(result, list) and len(result) > 0:
+                    first_item = result[0]
+                    intent = first_item.get("intent", "no").lower()
+                    cantidad = int(first_item.get("cantidad", 0))
+                elif isinstance(result, dict):
+                    intent = result.get("intent", "no").lower()
+                    cantidad = int(result.get("cantidad", 0))
+
+                logger.info(f"Intent from NLP: {intent}, cantidad: {cantidad}")
+            else:
+                logger.warning(f"Webhook returned status {webhook_response.status_code}")
         except Exception as e:
             logger.error(f"Failed to call NLP webhook: {e}")
         
@@ -749,53 +790,53 @@ async def process_user_queue(payload: ProcessQueueRequest):
                 
                 # Call vision service with frame URL
                 if frame_url:
-                    async with httpx.AsyncClient(timeout=15.0) as client:
-                        vision_response = await client.post(
-                            f"{VISION_SERVICE_URL}/match_product",
-                            json={
-                                "frame_urls": [frame_url],
-                                "streamer_id": payload.streamer_id
-                            },
-                            headers={"Content-Type": "application/json"}
-                        )
-                        if vision_response.status_code == 200:
-                            vision_result = vision_response.json()
-                            product_id = vision_result.get("productId")
-                            logger.info(f"Vision matched product_id: {product_id}")
-                            
-                            # Get product details
-                            if product_id and supabase:
-                                product_resp = supabase.table("products") \
-                                    .select("id,name,price,description,image_url") \
-                                    .eq("id", product_id) \
-                                    .limit(1) \
-                                    .execute()
-                                
-                                if product_resp.data and len(product_resp.data) > 0:
-                                    product = product_resp.data[0]
-                                    matched_product = {
-                                        "id": product.get("id"),
-                                        "name": product.get("name"),
-                                        "price": product.get("price"),
-                                        "description": product.get("description"),
-                                        "image_url": product.get("image_url"),
-                                        "cantidad": cantidad,
-                                        "total": float(product.get("price", 0)) * cantidad
-                                    }
-                                    payment_ready = True
-                                    response_text = f"¡Encontré el producto! {product.get('name')} - ${product.get('price')}. ¿Deseas comprar {cantidad} unidad(es)?"
-                                    
-                                    # Track buyer intent in Supabase
-                                    await add_buyer_intent(
-                                        streamer=payload.streamer_id,
-                                        username=payload.user_id,
-                                        message=all_messages,
-                                        cantidad=cantidad,
-                                        timestamp=first_timestamp,
-                                        product_name=product.get("name"),
-                                        product_price=product.get("price"),
-                                        product_id=str(product.get("id"))
-                                    )
+                    vision_response = await http_client.post(
+                        f"{VISION_SERVICE_URL}/match_product",
+                        json={
+                            "frame_urls": [frame_url],
+                            "streamer_id": payload.streamer_id
+                        },
+                        headers={"Content-Type": "application/json"},
+                        timeout=15.0
+                    )
+                    if vision_response.status_code == 200:
+                        vision_result = vision_response.json()
+                        product_id = vision_result.get("productId")
+                        logger.info(f"Vision matched product_id: {product_id}")
+
+                        # Get product details
+                        if product_id and supabase:
+                            product_resp = supabase.table("products") \
+                                .select("id,name,price,description,image_url") \
+                                .eq("id", product_id) \
+                                .limit(1) \
+                                .execute()
+
+                            if product_resp.data and len(product_resp.data) > 0:
+                                product = product_resp.data[0]
+                                matched_product = {
+                                    "id": product.get("id"),
+                                    "name": product.get("name"),
+                                    "price": product.get("price"),
+                                    "description": product.get("description"),
+                                    "image_url": product.get("image_url"),
+                                    "cantidad": cantidad,
+                                    "total": float(product.get("price", 0)) * cantidad
+                                }
+                                payment_ready = True
+                                response_text = f"¡Encontré el producto! {product.get('name')} - ${product.get('price')}. ¿Deseas comprar {cantidad} unidad(es)?"
+
+                                # Track buyer intent in Supabase
+                                await add_buyer_intent(
+                                    streamer=payload.streamer_id,
+                                    username=payload.user_id,
+                                    message=all_messages,
+                                    cantidad=cantidad,
+                                    timestamp=first_timestamp,
+                                    product_name=product.get("name"),
+                                    product_price=product.get("price"),
+                                    product_id=str(product.get("id"))
+                                )
                 
                 if not matched_product:
                     response_text = "Detecté intención de compra pero no pude identificar el producto. ¿Podrías ser más específico?"
@@ -2,6 +2,16 @@ from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field, validator
 from typing import Optional
+import os
+import logging
+import httpx
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Downstream services for the fused pipeline endpoint
+VISION_SERVICE_URL = os.getenv("VISION_SERVICE_URL", "http://vision-service:8002")
+ECOMMERCE_URL = os.getenv("ECOMMERCE_URL", "http://ecommerce:8082")
 
 app = FastAPI()
 
@@ -27,17 +37,92 @@ class TextPayload(BaseModel):
 def health():
     return {"ok": True}
 
+def score_intent(text: str) -> dict:
+    """Score buy intent for a single text (shared by all prediction routes)."""
+    text = text.lower()
+    keywords = ["lo quiero","comprar","me interesa","cómo lo pago","quiero comprar","quiero"]
+    score = 0.0
+    for k in keywords:
+        if k in text:
+            score = 0.95
+            break
+    intent = "buy" if score > 0.5 else "none"
+    return {"intent": intent, "score": score}
+
 @app.post("/predict_intent")
 def predict(payload: TextPayload):
     try:
-        text = payload.text.lower()
-        keywords = ["lo quiero","comprar","me interesa","cómo lo pago","quiero comprar","quiero"]
-        score = 0.0
-        for k in keywords:
-            if k in text:
-                score = 0.95
-                break
-        intent = "buy" if score > 0.5 else "none"
-        return {"intent": intent, "score": score}
+        return score_intent(payload.text)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+class TextBatchPayload(BaseModel):
+    texts: list[str] = Field(..., min_length=1, max_length=64)
+
+@app.post("/predict_intent_batch")
+def predict_batch(payload: TextBatchPayload):
+    """Score a micro-batch of texts in one call.
+
+    Amortizes the per-request fixed cost when the worker drains several
+    queued comments at once.
+    """
+    try:
+        return {"results": [score_intent(t) for t in payload.texts]}
     except Exception as e:
         raise HTTPException(status_code=500, detail="Internal server error")
+
+class CommentPayload(BaseModel):
+    comment: dict = Field(...)
+
+    @validator('comment')
+    def comment_must_have_message(cls, v):
+        if not v.get("message") or str(v["message"]).isspace():
+            raise ValueError('comment must contain a non-empty message')
+        return v
+
+@app.post("/pipeline/process_comment")
+async def process_comment_pipeline(payload: CommentPayload):
+    """Fused NLP -> Vision -> Order pipeline.
+
+    Runs the whole comment pipeline server-side so the worker pays a single
+    HTTP round trip instead of three. The individual endpoints stay available
+    for backward compatibility.
+    """
+    comment = payload.comment
+    nlp_result = score_intent(str(comment.get("message", "")))
+    result = {"nlp": nlp_result, "match": None, "order": None}
+
+    if not (nlp_result["intent"] == "buy" and nlp_result["score"] > 0.5):
+        return result
+
+    # Vision: match product from recent frames
+    match_result = {"productId": None, "score": 0.0}
+    try:
+        async with httpx.AsyncClient(timeout=15.0) as client:
+            response = await client.post(
+                f"{VISION_SERVICE_URL}/match_product",
+                json={"frame_urls": [], "streamer_id": comment.get("streamer")},
+            )
+            match_result = response.json()
+    except Exception as e:
+        logger.warning("Vision service failed: %s", e)
+    result["match"] = match_result
+
+    # Ecommerce: create order when the match is confident enough
+    if match_result.get("productId") and match_result.get("score", 0) > 0.7:
+        try:
+            async with httpx.AsyncClient(timeout=10.0) as client:
+                response = await client.post(
+                    f"{ECOMMERCE_URL}/order/create",
+                    json={
+                        "product_id": match_result["productId"],
+                        "buyer": comment.get("client"),
+                        "streamer": comment.get("streamer"),
+                        "source": "tiktok_live"
+                    },
+                )
+                result["order"] = response.json()
+        except Exception as e:
+            logger.warning("Order creation failed: %s", e)
+
+    return result
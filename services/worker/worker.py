@@ -1,16 +1,33 @@
 # TikTokSales/worker.py
 import asyncio
+import hashlib
 import json
 import os
+import re
 import logging
 import httpx
 import redis.asyncio as aioredis
-from datetime import datetime
+from datetime import datetime, timezone
 from io import BytesIO
 
 from minio import Minio
 from minio.error import S3Error
 
+try:
+    # uvloop is a drop-in replacement event loop, 2-4x faster on the
+    # socket-heavy workload of this worker (Redis + HTTP + MinIO).
+    import uvloop
+    uvloop.install()
+except ImportError:
+    uvloop = None
+
+try:
+    # HTTP/2 support is optional in httpx (needs the h2 package).
+    import h2  # noqa: F401
+    _HTTP2_AVAILABLE = True
+except ImportError:
+    _HTTP2_AVAILABLE = False
+
 logger = logging.getLogger("worker")
 logging.basicConfig(
     level=logging.INFO,
@@ -24,6 +41,20 @@ ECOMMERCE_URL = os.getenv("ECOMMERCE_URL", "http://ecommerce:8082")
 SUPABASE_URL = os.getenv("SUPABASE_URL", "")
 SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY", "")
 
+# Static Supabase REST headers, built once. Writes ask for return=minimal so
+# PostgREST skips serializing the inserted rows back to us.
+SUPABASE_READ_HEADERS = {
+    "apikey": SUPABASE_SERVICE_KEY,
+    "Authorization": f"Bearer {SUPABASE_SERVICE_KEY}",
+    "Accept": "application/json"
+}
+SUPABASE_WRITE_HEADERS = {
+    "apikey": SUPABASE_SERVICE_KEY,
+    "Authorization": f"Bearer {SUPABASE_SERVICE_KEY}",
+    "Content-Type": "application/json",
+    "Prefer": "return=minimal"
+}
+
 # Frame capture endpoint template (should return image bytes). Example: http://stream-capture/{streamer}/frame
 FRAME_CAPTURE_URL_TEMPLATE = os.getenv("FRAME_CAPTURE_URL_TEMPLATE", "http://vision-service:8002/capture_frame?streamer={streamer}")
 
@@ -38,6 +69,58 @@ minio_client = None
 
 redis_client = None
 
+# Cheap client-side pre-filter: the vast majority of live-chat comments ("lol",
+# emojis, greetings) can never be "buy" intent, so we skip the NLP round trip
+# for them entirely. Plain (unanchored) alternation, because the NLP service
+# matches bare substrings — a word boundary here would drop messages like
+# "tequiero" that the classifier would still score as buy.
+_BUY_HINT = re.compile(
+    r"\$|buy|want|quiero|comprar|interesa|pago|precio|price|cu[aá]nto",
+    re.IGNORECASE
+)
+
+# In-process cache of NLP verdicts keyed by normalized message text, so exact
+# repeated comments (very common live-chat spam) skip NLP after the first call.
+# Backed by a shared Redis cache (hash-keyed, TTL'd) so duplicates are also
+# suppressed across worker replicas and restarts.
+_NLP_CACHE_MAX = 4096
+_nlp_cache: dict = {}
+NLP_CACHE_TTL = int(os.getenv("NLP_CACHE_TTL", "600"))
+
+
+def _nlp_cache_key(normalized: str) -> str:
+    return "nlp:verdict:" + hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+# Max comments pulled per worker-loop iteration (one BLPOP + pipelined LPOPs)
+BATCH_SIZE = int(os.getenv("WORKER_BATCH_SIZE", "16"))
+
+# Shared per-host HTTP clients so every request reuses a bounded keep-alive
+# pool instead of paying a fresh TCP handshake. Keyed by base URL.
+http_clients: dict = {}
+
+
+def get_http_client(base_url: str = "") -> httpx.AsyncClient:
+    """Get (or lazily create) the shared AsyncClient for a host."""
+    client = http_clients.get(base_url)
+    if client is None:
+        client = httpx.AsyncClient(
+            base_url=base_url,
+            http2=_HTTP2_AVAILABLE,
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+            timeout=10.0
+        )
+        http_clients[base_url] = client
+    return client
+
+
+async def close_http_clients():
+    for client in http_clients.values():
+        try:
+            await client.aclose()
+        except Exception:
+            pass
+    http_clients.clear()
+
 async def connect_redis():
     global redis_client
     redis_client = aioredis.from_url(REDIS_URL, decode_responses=True)
@@ -67,77 +150,202 @@ def init_minio():
 async def process_comment(comment: dict):
     """Process a single comment through NLP → Vision → Order pipeline."""
     logger.debug("Processing comment: %s", comment)
-    
-    # Step 1: NLP Intent Detection
-    nlp_result = {"intent": "none", "score": 0.0}
+
+    # Step 0: Cheap pre-filter to avoid paying an NLP round trip for comments
+    # that can't possibly carry buy intent (too short / no purchase keywords).
+    message = comment.get("message", "")
+    normalized = message.strip().lower()
+    if len(normalized) < 3 or not _BUY_HINT.search(normalized):
+        logger.debug("Pre-filter: no buy hint in %r, skipping NLP", message)
+        return
+
+    # Exact repeated comments that already scored "none" skip the pipeline.
+    # Buy comments are never cached: each buyer must get their own order.
+    cached = _nlp_cache.get(normalized)
+    if cached is not None:
+        logger.debug("NLP cache hit for %r: %s", message, cached)
+        return
+
+    # Shared Redis cache catches duplicates seen by other worker replicas
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.post(
-                f"{NLP_SERVICE_URL}/predict_intent",
-                json={"text": comment.get("message", "")},
-                timeout=10.0
-            )
-            nlp_result = response.json()
-            logger.info("NLP result for '%s': %s", comment.get("message"), nlp_result)
+        cached_raw = await redis_client.get(_nlp_cache_key(normalized))
+        if cached_raw:
+            verdict = json.loads(cached_raw)
+            if len(_nlp_cache) >= _NLP_CACHE_MAX:
+                _nlp_cache.clear()
+            _nlp_cache[normalized] = verdict
+            logger.debug("Redis NLP cache hit for %r: %s", message, verdict)
+            return
     except Exception as e:
-        logger.warning("NLP service failed: %s", e)
-    
-    # Step 2: Check if purchase intent + confidence threshold
+        logger.debug("NLP cache lookup failed: %s", e)
+
+    # Fused pipeline call: NLP -> Vision -> Order run server-side on the NLP
+    # service, so the worker pays one HTTP round trip instead of three.
+    try:
+        client = get_http_client(NLP_SERVICE_URL)
+        response = await client.post(
+            f"{NLP_SERVICE_URL}/pipeline/process_comment",
+            json={"comment": comment},
+            timeout=30.0
+        )
+        result = response.json()
+    except Exception as e:
+        logger.warning("Pipeline call failed: %s", e)
+        return
+
+    nlp_result = result.get("nlp", {})
+    logger.info("NLP result for '%s': %s", message, nlp_result)
+
     if nlp_result.get("intent") == "buy" and nlp_result.get("score", 0) > 0.5:
         logger.info("🛒 BUY intent detected (score: %.2f)", nlp_result.get("score", 0))
-        
-        # Step 3: Vision Service - Match Product
-        match_result = {"productId": None, "score": 0.0}
-        try:
-            async with httpx.AsyncClient(timeout=15.0) as client:
-                # TODO: Fetch frame URLs from Supabase based on comment timestamp
-                response = await client.post(
-                    f"{VISION_SERVICE_URL}/match_product",
-                    json={"frame_urls": []},  # Pass actual URLs
-                    timeout=15.0
-                )
-                match_result = response.json()
-                logger.info("Vision match: %s", match_result)
-        except Exception as e:
-            logger.warning("Vision service failed: %s", e)
-        
-        # Step 4: Create Order if Product Match + Stock Available
-        if match_result.get("productId") and match_result.get("score", 0) > 0.7:
-            try:
-                async with httpx.AsyncClient(timeout=10.0) as client:
-                    order_payload = {
-                        "product_id": match_result["productId"],
-                        "buyer": comment.get("client"),
-                        "streamer": comment.get("streamer"),
-                        "source": "tiktok_live"
-                    }
-                    response = await client.post(
-                        f"{ECOMMERCE_URL}/order/create",
-                        json=order_payload,
-                        timeout=10.0
-                    )
-                    order = response.json()
-                    logger.info("✅ Order created: %s", order)
-            except Exception as e:
-                logger.warning("Order creation failed: %s", e)
+        order = result.get("order")
+        if order:
+            logger.info("✅ Order created: %s", order)
         else:
-            logger.info("No product match or confidence too low: %s", match_result)
+            logger.info("No product match or confidence too low: %s", result.get("match"))
     else:
+        if len(_nlp_cache) >= _NLP_CACHE_MAX:
+            _nlp_cache.clear()
+        _nlp_cache[normalized] = nlp_result
+        try:
+            await redis_client.set(
+                _nlp_cache_key(normalized), json.dumps(nlp_result), ex=NLP_CACHE_TTL
+            )
+        except Exception as e:
+            logger.debug("NLP cache write failed: %s", e)
         logger.debug("No buy intent: %s", nlp_result)
 
-async def get_active_queue_keys():
-    """Scan Redis for active comment queue keys."""
+async def match_and_order(comment: dict):
+    """Vision match + order creation for a comment already scored as buy."""
+    match_result = {"productId": None, "score": 0.0}
+    try:
+        client = get_http_client(VISION_SERVICE_URL)
+        response = await client.post(
+            f"{VISION_SERVICE_URL}/match_product",
+            json={"frame_urls": [], "streamer_id": comment.get("streamer")},
+            timeout=15.0
+        )
+        match_result = response.json()
+        logger.info("Vision match: %s", match_result)
+    except Exception as e:
+        logger.warning("Vision service failed: %s", e)
+
+    if match_result.get("productId") and match_result.get("score", 0) > 0.7:
+        try:
+            client = get_http_client(ECOMMERCE_URL)
+            order_payload = {
+                "product_id": match_result["productId"],
+                "buyer": comment.get("client"),
+                "streamer": comment.get("streamer"),
+                "source": "tiktok_live"
+            }
+            response = await client.post(
+                f"{ECOMMERCE_URL}/order/create",
+                json=order_payload,
+                timeout=10.0
+            )
+            logger.info("✅ Order created: %s", response.json())
+        except Exception as e:
+            logger.warning("Order creation failed: %s", e)
+    else:
+        logger.info("No product match or confidence too low: %s", match_result)
+
+
+async def process_comment_batch(comments: list):
+    """Process a micro-batch of comments with a single NLP call.
+
+    The whole batch is scored via /predict_intent_batch to amortize the
+    per-request fixed cost, then vision/order follow-ups for buy-intent
+    comments run concurrently.
+    """
+    candidates = []
+    for comment in comments:
+        message = comment.get("message", "")
+        normalized = message.strip().lower()
+        if len(normalized) < 3 or not _BUY_HINT.search(normalized):
+            continue
+        if _nlp_cache.get(normalized) is not None:
+            continue
+        candidates.append((comment, normalized))
+
+    if not candidates:
+        return
+
+    # Drop candidates already settled in the shared Redis cache (one MGET)
+    try:
+        cached_raws = await redis_client.mget(
+            [_nlp_cache_key(n) for _, n in candidates]
+        )
+        candidates = [c for c, raw in zip(candidates, cached_raws) if not raw]
+    except Exception as e:
+        logger.debug("NLP cache lookup failed: %s", e)
+
+    if not candidates:
+        return
+
+    try:
+        client = get_http_client(NLP_SERVICE_URL)
+        response = await client.post(
+            f"{NLP_SERVICE_URL}/predict_intent_batch",
+            json={"texts": [c.get("message", "") for c, _ in candidates]},
+            timeout=30.0
+        )
+        results = response.json().get("results", [])
+    except Exception as e:
+        logger.warning("Batch NLP call failed: %s", e)
+        return
+
+    followups = []
+    to_cache = []
+    for (comment, normalized), nlp_result in zip(candidates, results):
+        logger.info("NLP result for '%s': %s", comment.get("message"), nlp_result)
+        if nlp_result.get("intent") == "buy" and nlp_result.get("score", 0) > 0.5:
+            followups.append(match_and_order(comment))
+        else:
+            if len(_nlp_cache) >= _NLP_CACHE_MAX:
+                _nlp_cache.clear()
+            _nlp_cache[normalized] = nlp_result
+            to_cache.append((normalized, nlp_result))
+
+    if to_cache:
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for normalized, verdict in to_cache:
+                    pipe.set(_nlp_cache_key(normalized), json.dumps(verdict), ex=NLP_CACHE_TTL)
+                await pipe.execute()
+        except Exception as e:
+            logger.debug("NLP cache write failed: %s", e)
+
+    if followups:
+        await asyncio.gather(*followups)
+
+
+# SCAN cursor persisted across calls so successive samples resume where the
+# previous one stopped instead of always re-reading the first keyspace slice.
+_scan_cursor = 0
+
+
+async def get_active_queue_keys(max_keys: int = 100):
+    """Sample active comment queue keys from Redis.
+
+    Accumulates up to ``max_keys`` keys, resuming from where the previous
+    call's scan left off. SCAN's bucket order is deterministic, so always
+    restarting from 0 and returning the first batch would keep feeding the
+    same queues to BLPOP and starve any key that hashes later in the table;
+    rotating the cursor guarantees every queue gets sampled over successive
+    loop iterations.
+    """
+    global _scan_cursor
     try:
-        cursor = "0"
         keys = []
         while True:
-            cursor, batch = await redis_client.scan(
-                cursor, match="chat:queue:*", count=100
+            _scan_cursor, batch = await redis_client.scan(
+                _scan_cursor, match="chat:queue:*", count=100
             )
             keys.extend(batch)
-            if cursor == "0":
-                break
-        return keys
+            # redis-py returns the cursor as an int; 0 means a full wrap
+            if _scan_cursor == 0 or len(keys) >= max_keys:
+                return keys[:max_keys]
     except Exception as e:
         logger.error("Failed to scan keys: %s", e)
         return []
@@ -167,19 +375,42 @@ async def worker_loop():
             
             if result:
                 key, raw_comment = result
+                raw_batch = [(key, raw_comment)]
+
+                # Drain up to BATCH_SIZE-1 more messages without blocking so
+                # the NLP fixed cost is amortized across the micro-batch.
                 try:
-                    comment = json.loads(raw_comment)
+                    async with redis_client.pipeline(transaction=False) as pipe:
+                        for i in range(BATCH_SIZE - 1):
+                            pipe.lpop(keys[i % len(keys)])
+                        extras = await pipe.execute()
+                    raw_batch.extend(
+                        (keys[i % len(keys)], raw)
+                        for i, raw in enumerate(extras) if raw
+                    )
+                except Exception as e:
+                    logger.warning("Failed to drain queues: %s", e)
+
+                comments = []
+                for queue_key, raw in raw_batch:
+                    try:
+                        comment = json.loads(raw)
+                    except json.JSONDecodeError as e:
+                        logger.error("Invalid JSON in queue %s: %s", queue_key, e)
+                        continue
                     logger.info(
                         "📨 Processing from %s: streamer=%s client=%s",
-                        key, comment.get("streamer"), comment.get("client")
+                        queue_key, comment.get("streamer"), comment.get("client")
                     )
-                    await process_comment(comment)
-                except json.JSONDecodeError as e:
-                    logger.error("Invalid JSON in queue %s: %s", key, e)
-            else:
-                # Timeout - no messages available
-                await asyncio.sleep(0.1)
-                
+                    comments.append(comment)
+
+                if len(comments) == 1:
+                    await process_comment(comments[0])
+                elif comments:
+                    await process_comment_batch(comments)
+            # On BLPOP timeout there is nothing to back off from: the call
+            # itself already blocked for 5s, so loop straight into re-scan.
+
         except Exception as e:
             logger.exception("Worker loop error")
             await asyncio.sleep(1)
@@ -194,34 +425,32 @@ async def fetch_streamers_from_supabase() -> list:
 
     # Only fetch streamers that are currently live
     url = f"{SUPABASE_URL.rstrip('/')}/rest/v1/streamers?select=username&is_live=eq.true"
-    headers = {
-        "apikey": SUPABASE_SERVICE_KEY,
-        "Authorization": f"Bearer {SUPABASE_SERVICE_KEY}",
-        "Accept": "application/json"
-    }
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            r = await client.get(url, headers=headers)
-            if r.status_code == 200:
-                data = r.json()
-                live_streamers = [row.get("username") for row in data if row.get("username")]
-                if live_streamers:
-                    logger.info("Found %d live streamer(s): %s", len(live_streamers), live_streamers)
-                return live_streamers
-            else:
-                logger.warning("Failed to fetch streamers from Supabase: %s %s", r.status_code, r.text)
-                return []
+        client = get_http_client(SUPABASE_URL)
+        r = await client.get(url, headers=SUPABASE_READ_HEADERS, timeout=10.0)
+        if r.status_code == 200:
+            data = r.json()
+            live_streamers = [row.get("username") for row in data if row.get("username")]
+            if live_streamers:
+                logger.info("Found %d live streamer(s): %s", len(live_streamers), live_streamers)
+            return live_streamers
+        else:
+            logger.warning("Failed to fetch streamers from Supabase: %s %s", r.status_code, r.text)
+            return []
     except Exception as e:
         logger.warning("Error fetching streamers: %s", e)
         return []
 
 
-def upload_bytes_to_minio(content: bytes, streamer: str, timestamp: datetime, content_type: str = "image/jpeg") -> dict:
-    """Upload raw bytes to MinIO and return object info."""
+def upload_bytes_to_minio(content: bytes, streamer: str, ts: str, content_type: str = "image/jpeg") -> dict:
+    """Upload raw bytes to MinIO and return object info.
+
+    `ts` is the pre-formatted "%Y%m%d_%H%M%S" timestamp, built once per frame
+    by the caller so the datetime round trip stays out of the upload path.
+    """
     if not minio_client:
         raise RuntimeError("MinIO client not initialized")
 
-    ts = timestamp.strftime("%Y%m%d_%H%M%S")
     ext = "jpg"
     object_name = f"frames/{streamer}/{ts}.{ext}"
     try:
@@ -239,39 +468,38 @@ def upload_bytes_to_minio(content: bytes, streamer: str, timestamp: datetime, co
         raise
 
 
-async def save_frame_record_to_supabase(streamer: str, timestamp: datetime, minio_url: str, minio_object: str):
-    """Insert a frame record into Supabase via REST API."""
+async def save_frame_records_to_supabase(records: list):
+    """Bulk-insert frame records into Supabase via a single REST call.
+
+    Supabase's REST API accepts a JSON array, so one POST covers every frame
+    captured in a collector cycle instead of one request per streamer.
+    """
+    if not records:
+        return None
     if not SUPABASE_URL or not SUPABASE_SERVICE_KEY:
-        logger.debug("Supabase not configured; skipping DB insert for frame")
+        logger.debug("Supabase not configured; skipping DB insert for %d frame(s)", len(records))
         return None
 
     url = f"{SUPABASE_URL.rstrip('/')}/rest/v1/streamer_frames"
-    headers = {
-        "apikey": SUPABASE_SERVICE_KEY,
-        "Authorization": f"Bearer {SUPABASE_SERVICE_KEY}",
-        "Content-Type": "application/json",
-        "Prefer": "return=representation"
-    }
-    payload = {
-        "streamer": streamer,
-        "frame_timestamp": timestamp.isoformat(),
-        "minio_url": minio_url,
-        "minio_object": minio_object
-    }
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            r = await client.post(url, headers=headers, json=payload)
-            if r.status_code in (200, 201):
-                logger.info("Saved frame metadata to Supabase for %s @ %s", streamer, timestamp)
-                return r.json()
-            else:
-                logger.warning("Failed to save frame to Supabase: %s %s", r.status_code, r.text)
-                return None
+        client = get_http_client(SUPABASE_URL)
+        r = await client.post(url, headers=SUPABASE_WRITE_HEADERS, json=records, timeout=10.0)
+        if r.status_code in (200, 201, 204):
+            logger.info("Saved %d frame record(s) to Supabase", len(records))
+            return True
+        else:
+            logger.warning("Failed to save frames to Supabase: %s %s", r.status_code, r.text)
+            return None
     except Exception as e:
-        logger.warning("Error saving frame to Supabase: %s", e)
+        logger.warning("Error saving frames to Supabase: %s", e)
         return None
 
 
+# Digest of the last uploaded frame per streamer; identical consecutive
+# captures (static scene, frozen stream) skip the MinIO upload entirely.
+_last_frame_digest: dict = {}
+
+
 async def collect_frames_loop(poll_interval: int = 10):
     """Periodically capture frames per streamer and store them in MinIO and Supabase."""
     logger.info("Frame collector started (interval=%ss)", poll_interval)
@@ -283,26 +511,48 @@ async def collect_frames_loop(poll_interval: int = 10):
                 await asyncio.sleep(poll_interval)
                 continue
 
+            frame_records = []
             for streamer in streamers:
                 try:
                     capture_url = FRAME_CAPTURE_URL_TEMPLATE.format(streamer=streamer)
-                    async with httpx.AsyncClient(timeout=10.0) as client:
-                        r = await client.get(capture_url)
+                    client = get_http_client()
+                    # Stream so the status/content-type check happens on the
+                    # headers alone; non-image responses never download a body.
+                    async with client.stream("GET", capture_url, timeout=10.0) as r:
                         if r.status_code == 200 and r.headers.get("content-type", "").startswith("image"):
-                            timestamp = datetime.utcnow()
+                            # utcnow() is deprecated and naive; one aware
+                            # timestamp per frame, formatted once.
+                            timestamp = datetime.now(timezone.utc)
+                            ts_str = timestamp.strftime("%Y%m%d_%H%M%S")
                             content_type = r.headers.get("content-type")
-                            blob = r.content
-                            # Upload to MinIO (blocking put_object through helper)
+                            blob = await r.aread()
+                            digest = hashlib.md5(blob).digest()
+                            if _last_frame_digest.get(streamer) == digest:
+                                logger.debug("Frame unchanged for %s; skipping upload", streamer)
+                                continue
+                            # put_object is blocking; run it in a thread so
+                            # the event loop keeps serving other streamers.
                             try:
-                                info = upload_bytes_to_minio(blob, streamer, timestamp, content_type)
-                                await save_frame_record_to_supabase(streamer, timestamp, info["minio_url"], info["minio_object"])
+                                info = await asyncio.to_thread(
+                                    upload_bytes_to_minio, blob, streamer, ts_str, content_type
+                                )
+                                _last_frame_digest[streamer] = digest
+                                frame_records.append({
+                                    "streamer": streamer,
+                                    "frame_timestamp": timestamp.isoformat(),
+                                    "minio_url": info["minio_url"],
+                                    "minio_object": info["minio_object"]
+                                })
                             except Exception as e:
-                                logger.warning("Failed to upload/save frame for %s: %s", streamer, e)
+                                logger.warning("Failed to upload frame for %s: %s", streamer, e)
                         else:
                             logger.debug("No image captured for %s (status=%s)", streamer, r.status_code)
                 except Exception as e:
                     logger.warning("Collector error for streamer %s: %s", streamer, e)
 
+            # One bulk insert for every frame captured this cycle
+            await save_frame_records_to_supabase(frame_records)
+
             await asyncio.sleep(poll_interval)
         except Exception as e:
             logger.exception("Frame collector loop error")
@@ -324,6 +574,7 @@ async def main():
         logger.exception("Fatal error: %s", e)
         raise
     finally:
+        await close_http_clients()
         if redis_client:
             await redis_client.close()
 